@@ -6,6 +6,11 @@ from oauth2client.service_account import ServiceAccountCredentials
 import time
 import calendar
 import os
+import sys
+import json
+import sqlite3
+import re
+from contextlib import closing
 from fpdf import FPDF
 
 # =========================================================
@@ -13,7 +18,8 @@ from fpdf import FPDF
 # =========================================================
 st.set_page_config(page_title="지질공원 통합관리", page_icon="🪨", layout="wide")
 
-st.markdown("""
+def apply_style():
+    st.markdown("""
     <style>
     html, body, [class*="css"] { font-size: 18px !important; }
     div[data-testid="stDataEditor"] table { font-size: 16px !important; }
@@ -27,6 +33,27 @@ st.markdown("""
 SHEET_ACTIVITY = "활동일지"   # 개인별 (이름, 시간, 청취자, 횟수, 내용)
 SHEET_OPERATION = "운영일지" # 장소별 (탐방객, 특이사항)
 SHEET_PLAN = "활동계획"      # 계획
+SHEET_EVENTS = "이벤트로그"  # 이벤트 모드 변경 기록 (타임스탬프, 시트, 동작, 데이터)
+EVENT_HEADER = ["타임스탬프", "시트", "동작", "데이터"]
+SHEET_USERS = "사용자"        # 계정 (아이디, 비번, 이름, 직책, 섬)
+USER_SECRET_COLS = ["아이디", "비번"] # 공유 캐시에 저장하지 않는 컬럼
+SHEET_LOCK = "압축잠금"       # 압축 동시 실행 방지 (보유자, 만료)
+SHEET_TEMPLATE = "계획템플릿" # 반복 계획 (템플릿명, 섬, 장소, 요일, 활동여부)
+TEMPLATE_HEADER = ["템플릿명", "섬", "장소", "요일", "활동여부", "작성자", "타임스탬프"]
+JOURNAL_COLS = ["날짜", "섬", "장소", "이름", "활동시간", "활동내용", "청취자수", "해설횟수"] # 활동조회 표시 컬럼
+PLAN_HEADER = ["날짜","섬","장소","이름","활동여부","비고","타임스탬프","년","월","상태","대타여부","기존해설사"]
+
+# 이벤트 모드: 저장/대타/취소/승인을 이벤트로그에 추가만 하고, 시트는 압축(compact_events) 때만 재작성
+EVENT_MODE = os.environ.get("GEOPARK_EVENT_MODE", "") == "1"
+
+# 공유 캐시: 같은 서버의 여러 Streamlit 프로세스가 시트 스냅샷/사용자 목록(이름, 섬만)을 SQLite 파일로 공유
+# 계정 정보(아이디/비번)는 저장하지 않음
+# 쓰기 시 시트별 버전을 올려 모든 프로세스의 캐시를 무효화 (TTL은 시트를 직접 수정한 경우 대비)
+SHARED_CACHE_PATH = os.environ.get("GEOPARK_SHARED_CACHE", "")  # 예: /var/cache/geopark/cache.db
+SHARED_CACHE_TTL = 300
+
+# 검색 색인 (특이사항/활동내용 역색인, 저장 시 갱신)
+SEARCH_INDEX_PATH = os.environ.get("GEOPARK_SEARCH_INDEX", "geopark_search.db")
 
 LOCATIONS = {
     "백령도": ["두무진 안내소", "콩돌해안 안내소", "사곶해변 안내소", "용기포신항 안내소", "진촌리 현무암 안내소", "용틀임바위 안내소", "임시지질공원센터"],
@@ -56,18 +83,159 @@ def get_client():
 
 client = get_client()
 
-def load_data(sheet_name, year=None, month=None, island=None):
+def _norm_cols(df):
+    """시트 헤더 정리 (공백 제거, 일자 -> 날짜)"""
+    df.columns = [str(c).strip() for c in df.columns]
+    if '일자' in df.columns: df.rename(columns={'일자': '날짜'}, inplace=True)
+    return df
+
+def _json_default(v):
+    # numpy 숫자 등 JSON 비호환 값 처리
+    return v.item() if hasattr(v, 'item') else str(v)
+
+# ---------------------------------------------------------
+# 공유 캐시 (SQLite, 프로세스 간)
+# ---------------------------------------------------------
+def _cache_db():
+    con = sqlite3.connect(SHARED_CACHE_PATH, timeout=10)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("CREATE TABLE IF NOT EXISTS versions (sheet TEXT PRIMARY KEY, ver INTEGER NOT NULL)")
+    con.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, sheet TEXT, ver INTEGER, at REAL, data TEXT)")
+    return con
+
+def _shared_get(sheet_name, key, fetch):
+    """버전이 같고 TTL 이내면 공유 캐시 사용, 아니면 fetch() 후 저장 (캐시 오류 시 그냥 fetch)"""
+    if not SHARED_CACHE_PATH: return fetch()
+    try:
+        with closing(_cache_db()) as con:
+            row = con.execute(
+                "SELECT e.data FROM entries e LEFT JOIN versions v ON v.sheet = e.sheet "
+                "WHERE e.key = ? AND e.ver = COALESCE(v.ver, 0) AND e.at > ?",
+                (key, time.time() - SHARED_CACHE_TTL)).fetchone()
+            if row: return json.loads(row[0])
+            # 읽기 전 버전 기록 -> 읽는 도중 쓰기가 있으면 저장된 항목은 바로 무효
+            ver = (con.execute("SELECT ver FROM versions WHERE sheet = ?", (sheet_name,)).fetchone() or [0])[0]
+    except sqlite3.Error: return fetch()
+    
+    data = fetch()
+    try:
+        with closing(_cache_db()) as con, con:
+            con.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                        (key, sheet_name, ver, time.time(), json.dumps(data, ensure_ascii=False, default=_json_default)))
+    except sqlite3.Error: pass
+    return data
+
+def _shared_bump(sheet_name):
+    """시트 쓰기 후 호출: 모든 프로세스의 해당 시트 캐시 무효화"""
+    if not SHARED_CACHE_PATH: return
+    try:
+        with closing(_cache_db()) as con, con:
+            con.execute("INSERT INTO versions VALUES (?, 1) ON CONFLICT(sheet) DO UPDATE SET ver = ver + 1", (sheet_name,))
+    except sqlite3.Error: pass
+
+def _fetch_records(sheet_name):
+    """시트 전체 레코드 (get_all_records, 공유 캐시 경유. 사용자 시트는 계정 정보가 있어 직접 읽음)"""
+    def fetch(): return client.open("지질공원_운영일지_DB").worksheet(sheet_name).get_all_records()
+    if sheet_name == SHEET_USERS: return fetch()
+    return _shared_get(sheet_name, f"records:{sheet_name}", fetch)
+
+@st.cache_data(ttl=SHARED_CACHE_TTL, max_entries=50, show_spinner=False)
+def _load_snapshot(sheet_name, gen):
+    """이벤트 모드 스냅샷. gen(마지막 압축 표시)이 바뀌면 다시 읽음 -> 다른 프로세스의 압축도 반영"""
+    return _fetch_records(sheet_name)
+
+def _load_events():
+    """이벤트로그 전체 (압축 이후 쌓인 꼬리 부분)"""
+    try: return _fetch_records(SHEET_EVENTS)
+    except: return []
+
+def _read_records(sheet_name):
+    """
+    시트 원본 레코드 (날짜 변환 전)
+    이벤트 모드: 캐시된 스냅샷 + 이벤트 꼬리를 접어서 현재 상태 계산
+    """
+    if EVENT_MODE:
+        events = _load_events()
+        gen = next((e['데이터'] for e in reversed(events) if e.get('동작') == "compact"), "")
+        try: data = _load_snapshot(sheet_name, gen)
+        except: data = []
+        return _fold_events(_norm_cols(pd.DataFrame(data)), sheet_name, events)
+    return _norm_cols(pd.DataFrame(_fetch_records(sheet_name)))
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _get_header(sheet_name):
+    """헤더 행 (컬럼 위치 확인용, 시트당 한 번)"""
+    sh = client.open("지질공원_운영일지_DB").worksheet(sheet_name)
+    return [str(c).strip() for c in sh.row_values(1)]
+
+def _read_columns(sheet_name, columns):
+    """
+    필요한 컬럼 범위만 읽기 (batch_get 한 번)
+    헤더 위치가 바뀌었으면 캐시를 비우고 전체 읽기로 대체
+    """
+    header = _get_header(sheet_name)
+    names = ['일자' if (c == '날짜' and c not in header and '일자' in header) else c for c in columns]
+    pos = {c: header.index(c) + 1 for c in names if c in header}
+    if not pos: return pd.DataFrame()
+    
+    ranges = []
+    for i in pos.values():
+        col = gspread.utils.rowcol_to_a1(1, i)[:-1]
+        ranges.append(f"{col}1:{col}")
+    def fetch():
+        sh = client.open("지질공원_운영일지_DB").worksheet(sheet_name)
+        return [list(vr) for vr in sh.batch_get(ranges)]
+    secret = sheet_name == SHEET_USERS and any(c in USER_SECRET_COLS for c in pos)
+    res = fetch() if secret else _shared_get(sheet_name, f"cols:{sheet_name}:{','.join(ranges)}", fetch)
+    
+    data = {}
+    for c, vr in zip(pos, res):
+        vals = [r[0] if r else "" for r in vr]
+        if not vals or str(vals[0]).strip() != c:
+            _get_header.clear()
+            return _norm_cols(pd.DataFrame(_fetch_records(sheet_name)))
+        data[c] = gspread.utils.numericise_all(vals[1:], empty2zero=False, default_blank="")
+    n = max(len(v) for v in data.values())
+    df = pd.DataFrame({c: v + [""] * (n - len(v)) for c, v in data.items()})
+    return _norm_cols(df)
+
+def load_row(sheet_name, match):
+    """
+    match 조건의 첫 행 하나만 읽기 (없으면 None)
+    키 컬럼만 읽어 행 번호를 찾은 뒤 그 행만 가져옴 (이벤트 모드는 전체 상태에서 찾음)
+    """
+    try:
+        if EVENT_MODE:
+            df = _read_records(sheet_name)
+            hit = df[_match_mask(df, match)]
+            return None if hit.empty else hit.iloc[0].to_dict()
+        keys = _read_columns(sheet_name, list(match))
+        if keys.empty: return None
+        hit = keys.index[_match_mask(keys, match)]
+        if len(hit) == 0: return None
+        r = int(hit[0]) + 2 # 헤더 다음 행부터
+        def fetch(): return client.open("지질공원_운영일지_DB").worksheet(sheet_name).row_values(r)
+        vals = fetch() if sheet_name == SHEET_USERS else _shared_get(sheet_name, f"row:{sheet_name}:{r}", fetch)
+        header = _get_header(sheet_name)
+        vals = gspread.utils.numericise_all(vals + [""] * (len(header) - len(vals)), empty2zero=False, default_blank="")
+        return dict(zip(['날짜' if h == '일자' else h for h in header], vals))
+    except: return None
+
+def load_data(sheet_name, year=None, month=None, island=None, columns=None):
+    """
+    시트 로드 + 년/월/섬 필터
+    columns 지정 시 해당 컬럼만 읽음 (이벤트 모드는 전체 읽은 뒤 선택)
+    """
     try:
         # 시트가 없으면 생성 시도 (에러 방지)
-        try: sh = client.open("지질공원_운영일지_DB").worksheet(sheet_name)
+        try:
+            if columns and not EVENT_MODE:
+                need = list(columns) + (['날짜'] if (year or month) else []) + (['섬'] if island else [])
+                df = _read_columns(sheet_name, list(dict.fromkeys(need)))
+            else: df = _read_records(sheet_name)
         except: return pd.DataFrame()
             
-        data = sh.get_all_records()
-        if not data: return pd.DataFrame()
-        
-        df = pd.DataFrame(data)
-        df.columns = [str(c).strip() for c in df.columns]
-        if '일자' in df.columns: df.rename(columns={'일자': '날짜'}, inplace=True)
+        if df.empty: return pd.DataFrame()
         
         # 컬럼 보정
         for c in ['대타여부', '기존해설사', '상태']:
@@ -86,63 +254,339 @@ def load_data(sheet_name, year=None, month=None, island=None):
         
         if island and '섬' in df.columns:
             df = df[df['섬'] == island]
-            
+        
+        if columns: df = df[[c for c in columns if c in df.columns]]
         return df
     except Exception as e:
         return pd.DataFrame()
 
-def save_plan_data(new_rows, header_list):
-    """활동계획 저장 전용 (기존 로직 유지)"""
-    return _save_general(SHEET_PLAN, new_rows, header_list, unique_cols=['날짜', '이름', '장소'])
+# ---------------------------------------------------------
+# 병합 로직 (일반 저장과 이벤트 접기에서 공통 사용)
+# ---------------------------------------------------------
+def _has_plan(df):
+    """활동여부가 채워진 행 (활동여부 컬럼이 없는 시트는 모두 True)"""
+    if '활동여부' not in df.columns: return pd.Series(True, index=df.index)
+    return df['활동여부'].astype(str).str.strip() != ""
 
-def _save_general(sheet_name, new_rows, header_list, unique_cols):
-    try:
-        doc = client.open("지질공원_운영일지_DB")
-        try: sh = doc.worksheet(sheet_name)
-        except: 
-            sh = doc.add_worksheet(sheet_name, 1000, len(header_list))
-            sh.append_row(header_list)
-            
-        existing = sh.get_all_records()
-        old_df = pd.DataFrame(existing) if existing else pd.DataFrame(columns=header_list)
-        new_df = pd.DataFrame(new_rows, columns=header_list)
+def _upsert_rows(old_df, new_rows, header_list, unique_cols, insert_only=False):
+    """unique_cols 키가 같은 기존 행을 새 행으로 교체 (insert_only: 기존에 없는 키만 추가)"""
+    if old_df.empty: old_df = pd.DataFrame(columns=header_list)
+    new_df = pd.DataFrame(new_rows, columns=header_list)
+    
+    # 키 생성
+    def make_key(d):
+        return "".join([str(d.get(c, '')) for c in unique_cols])
+
+    if not old_df.empty: old_df['key'] = old_df.apply(make_key, axis=1)
+    else: old_df['key'] = []
+    new_df['key'] = new_df.apply(make_key, axis=1)
         
-        old_df.columns = [str(c).strip() for c in old_df.columns]
-        if '일자' in old_df.columns: old_df.rename(columns={'일자': '날짜'}, inplace=True)
+    if insert_only:
+        # 기존 계획은 그대로 두고 없는 키만 추가. 빈 활동여부 행(계획입력 그리드의 휴무일)은 계획 없음으로 보고 교체
+        filled = _has_plan(old_df)
+        new_df = new_df[~new_df['key'].isin(old_df.loc[filled, 'key'])].drop_duplicates('key')
+        keys_to_remove = new_df['key'].tolist()
+    else: keys_to_remove = new_df['key'].tolist()
+    if not old_df.empty:
+        final_df = old_df[~old_df['key'].isin(keys_to_remove)].copy()
+    else:
+        final_df = old_df
+    
+    final_df = final_df.drop(columns=['key'], errors='ignore')
+    new_df = new_df.drop(columns=['key'], errors='ignore')
+    
+    for col in header_list:
+        if col not in final_df.columns: final_df[col] = ""
         
-        # 키 생성
-        def make_key(d):
-            return "".join([str(d.get(c, '')) for c in unique_cols])
+    final_df = final_df[header_list]
+    new_df = new_df[header_list]
+    
+    combined = pd.concat([final_df, new_df], ignore_index=True)
+    combined = combined.fillna("")
+    
+    if '날짜' in combined.columns:
+        combined['날짜'] = pd.to_datetime(combined['날짜'], errors='coerce')
+        combined = combined.sort_values('날짜')
+        combined['날짜'] = combined['날짜'].dt.strftime("%Y-%m-%d")
+    return combined
 
-        if not old_df.empty: old_df['key'] = old_df.apply(make_key, axis=1)
-        else: old_df['key'] = []
-        new_df['key'] = new_df.apply(make_key, axis=1)
+def _merge_op_values(old_visitors, old_note, in_visitors, in_note):
+    """같은 [날짜+장소] 두 입력 합치기 -> (탐방객수, 특이사항)"""
+    # [핵심] 더 작은 방문객 수 적용
+    final_visitors = min(old_visitors, in_visitors) if (old_visitors > 0 and in_visitors > 0) else max(old_visitors, in_visitors)
+    # 0이 아닌 값들 중 최소값, 둘다 0이면 0. (단, 한쪽이 0이면 입력 누락일 수 있으니 큰값? 사용자 요청은 '적은 수')
+    # 사용자 요청대로 무조건 작은 수 적용 (단, 0 입력 시 0이 될 위험 있음. 하지만 요청 준수)
+    # 만약 둘 중 하나가 0이라면? -> 0을 무시할지, 0을 적용할지.
+    # "같은 날에 2개의 데이터가 만들어지면 적은 수를 적용시켜" -> 
+    # 보통 50, 50 입력하면 50. 50, 60 입력하면 50.
+    # 50, 0 입력하면? 0이 됨. (사용자가 0으로 정정하고 싶을 수도 있음)
+    # 따라서 min() 그대로 사용.
+    final_visitors = min(old_visitors, in_visitors)
+    if old_visitors == 0 and in_visitors > 0: final_visitors = in_visitors # 기존이 0이면 새 값 (최초입력 간주)
+    elif old_visitors > 0 and in_visitors == 0: final_visitors = old_visitors # 새 값이 0이면 무시 (실수 방지)
+    elif old_visitors > 0 and in_visitors > 0: final_visitors = min(old_visitors, in_visitors)
+    
+    # 특이사항 합치기 (중복 아니면)
+    final_note = old_note
+    if in_note and in_note not in old_note:
+        final_note = f"{old_note} / {in_note}" if old_note else in_note
+    return final_visitors, final_note
+
+def _merge_op_row(df_op, op_row, op_header):
+    """운영일지: [날짜+장소] 키로 조회하여 방문객 수는 Min값 적용, 비고는 합침"""
+    if df_op.empty: df_op = pd.DataFrame(columns=op_header)
+    
+    # 입력값 파싱
+    in_date = op_row[0]
+    in_place = op_row[2]
+    in_visitors = int(op_row[3])
+    in_note = str(op_row[4])
+    
+    # 날짜 포맷 통일
+    df_op['d_str'] = pd.to_datetime(df_op['날짜'], errors='coerce').dt.strftime("%Y-%m-%d")
+    
+    # 중복 확인 (날짜+장소)
+    mask = (df_op['d_str'] == in_date) & (df_op['장소'] == in_place)
+    
+    if mask.any():
+        # 이미 데이터가 있음 -> '작은 수' 적용 로직
+        existing_idx = df_op[mask].index[0]
+        old_visitors = int(pd.to_numeric(df_op.at[existing_idx, '탐방객수'], errors='coerce') or 0)
+        old_note = str(df_op.at[existing_idx, '특이사항'])
+        
+        final_visitors, final_note = _merge_op_values(old_visitors, old_note, in_visitors, in_note)
             
-        keys_to_remove = new_df['key'].tolist()
-        if not old_df.empty:
-            final_df = old_df[~old_df['key'].isin(keys_to_remove)].copy()
-        else:
-            final_df = old_df
+        # 업데이트
+        df_op.at[existing_idx, '탐방객수'] = final_visitors
+        df_op.at[existing_idx, '특이사항'] = final_note
+        df_op.at[existing_idx, '타임스탬프'] = op_row[5] # 수정시간
         
-        final_df = final_df.drop(columns=['key'], errors='ignore')
-        new_df = new_df.drop(columns=['key'], errors='ignore')
+    else:
+        # 신규 추가
+        new_df = pd.DataFrame([op_row], columns=op_header)
+        df_op = pd.concat([df_op, new_df], ignore_index=True)
         
-        for col in header_list:
-            if col not in final_df.columns: final_df[col] = ""
-            
-        final_df = final_df[header_list]
-        new_df = new_df[header_list]
+    # 정리
+    if 'd_str' in df_op.columns: df_op = df_op.drop(columns=['d_str'])
+    return df_op.fillna("")
+
+def _match_mask(df, match):
+    """match: {컬럼: 값 또는 값 목록}. 날짜는 YYYY-MM-DD 문자열로 비교"""
+    mask = pd.Series(True, index=df.index)
+    for c, v in match.items():
+        if c not in df.columns: return pd.Series(False, index=df.index)
+        col = pd.to_datetime(df[c], errors='coerce').dt.strftime("%Y-%m-%d") if c == '날짜' else df[c]
+        mask &= col.isin(v) if isinstance(v, list) else (col == v)
+    return mask
+
+def _date_str(v):
+    """날짜 값 -> YYYY-MM-DD (변환 불가면 빈 문자열)"""
+    s = str(v).strip()
+    if len(s) == 10 and s[4] == '-' and s[7] == '-': return s
+    d = pd.to_datetime(s, errors='coerce')
+    return "" if pd.isna(d) else d.strftime("%Y-%m-%d")
+
+def _fold_events(df, sheet_name, events):
+    """
+    이벤트 꼬리를 한 번에 적용 (upsert / insert_missing / op_merge / delete / set)
+    행은 dict 로 두고 키 색인으로 교체/병합, 날짜 정렬은 마지막에 한 번
+    """
+    evs = [(e.get('동작'), json.loads(e['데이터'])) for e in events if e.get('시트') == sheet_name]
+    if not evs: return df
+    
+    cols = list(df.columns)
+    rows = dict(enumerate(df.to_dict('records')))
+    nxt = len(rows)
+    indexes = {} # 키 컬럼 tuple -> {키 값 tuple: 행 id 집합}
+    resort = False
+
+    def kv(r, c): return _date_str(r.get(c, '')) if c == '날짜' else str(r.get(c, ''))
+    def key(r, kc): return tuple(kv(r, c) for c in kc)
+    def index_for(kc):
+        if kc not in indexes:
+            ix = {}
+            for i, r in rows.items(): ix.setdefault(key(r, kc), set()).add(i)
+            indexes[kc] = ix
+        return indexes[kc]
+    def add(r):
+        nonlocal nxt
+        rows[nxt] = r
+        for kc, ix in indexes.items(): ix.setdefault(key(r, kc), set()).add(nxt)
+        nxt += 1
+    def remove(i):
+        r = rows.pop(i)
+        for kc, ix in indexes.items(): ix.get(key(r, kc), set()).discard(i)
+    def matches(r, match):
+        for c, v in match.items():
+            if c not in cols: return False
+            want = [(_date_str(x) if c == '날짜' else str(x)) for x in (v if isinstance(v, list) else [v])]
+            if kv(r, c) not in want: return False
+        return True
+
+    for op, d in evs:
+        if op in ("upsert", "insert_missing"):
+            # _upsert_rows 와 같은 결과: 같은 키 행 교체(insert_missing 은 없는 키만 추가), 컬럼은 header 기준
+            kc = tuple(d['unique']); ix = index_for(kc)
+            cols = list(d['header']); resort = True
+            for vals in d['rows']:
+                r = dict(zip(d['header'], vals))
+                hit = list(ix.get(key(r, kc), ()))
+                # insert_missing: 활동여부가 채워진 기존 행이 있을 때만 건너뜀 (_has_plan 과 같은 규칙)
+                if op == "insert_missing" and any(str(rows[i].get('활동여부', 'x')).strip() != "" for i in hit): continue
+                for i in hit: remove(i)
+                add(r)
+        elif op == "op_merge":
+            kc = ('날짜', '장소'); ix = index_for(kc)
+            if not cols: cols = list(d['header'])
+            r_in = dict(zip(d['header'], d['row']))
+            hit = sorted(ix.get(key(r_in, kc), ()))
+            if hit:
+                r = rows[hit[0]]
+                old_v = int(pd.to_numeric(r.get('탐방객수', 0), errors='coerce') or 0)
+                r['탐방객수'], r['특이사항'] = _merge_op_values(old_v, str(r.get('특이사항', '')), int(r_in['탐방객수']), str(r_in['특이사항']))
+                r['타임스탬프'] = r_in['타임스탬프']
+            else: add(r_in)
+        elif op == "delete":
+            for i in [i for i, r in rows.items() if matches(r, d['match'])]: remove(i)
+        elif op == "set":
+            for c in d['values']:
+                if c not in cols: cols.append(c)
+            for r in rows.values():
+                if matches(r, d['match']): r.update(d['values'])
+    
+    out = pd.DataFrame(list(rows.values()), columns=cols).fillna("")
+    if resort and '날짜' in out.columns:
+        out['날짜'] = pd.to_datetime(out['날짜'], errors='coerce')
+        out = out.sort_values('날짜', kind="stable")
+        out['날짜'] = out['날짜'].dt.strftime("%Y-%m-%d")
+    return out.fillna("").reset_index(drop=True)
+
+# ---------------------------------------------------------
+# 쓰기
+# ---------------------------------------------------------
+def _get_or_add_sheet(doc, sheet_name, header_list):
+    try: return doc.worksheet(sheet_name)
+    except:
+        sh = doc.add_worksheet(sheet_name, 1000, len(header_list))
+        sh.append_row(header_list)
+        _shared_bump(sheet_name)
+        return sh
+
+def _overwrite_sheet(sh, df):
+    """clear() 없이 덮어쓰고 남는 아래쪽 행/오른쪽 컬럼만 지움 (빈 시트 구간 없음)"""
+    df = df.fillna("")
+    values = [df.columns.values.tolist()] + df.values.tolist()
+    sh.update(values)
+    stale = []
+    if sh.row_count > len(values): stale.append(f"{len(values)+1}:{sh.row_count}")
+    if sh.col_count > len(df.columns):
+        # 헤더에서 빠진 오른쪽 컬럼도 지움 (정렬 후 다른 행 옆에 남지 않도록)
+        a = gspread.utils.rowcol_to_a1(1, len(df.columns) + 1)[:-1]
+        b = gspread.utils.rowcol_to_a1(1, sh.col_count)[:-1]
+        stale.append(f"{a}1:{b}{sh.row_count}")
+    if stale: sh.batch_clear(stale)
+    _shared_bump(sh.title)
+
+def _append_events(events):
+    """이벤트 모드 저장: 시트를 다시 쓰지 않고 이벤트로그에 행만 추가 (events: [(시트, 동작, 데이터)])"""
+    doc = client.open("지질공원_운영일지_DB")
+    ev = _get_or_add_sheet(doc, SHEET_EVENTS, EVENT_HEADER)
+    now = str(datetime.now())
+    rows = [[now, s, op, json.dumps(d, ensure_ascii=False, default=_json_default)] for s, op, d in events]
+    ev.append_rows(rows, value_input_option="RAW")
+    _shared_bump(SHEET_EVENTS)
+
+def compact_events():
+    """
+    이벤트로그를 각 시트(스냅샷)에 반영하고 반영된 이벤트 삭제
+    주기 실행: python app.py --compact (cron 등)
+    """
+    doc = client.open("지질공원_운영일지_DB")
+    try: ev = doc.worksheet(SHEET_EVENTS)
+    except: return 0
+    
+    # 다른 압축(cron / 관리자 버튼)이 진행 중이면 건너뜀
+    token = f"{os.getpid()}@{time.time()}"
+    if not _acquire_compact_lease(doc, token): return 0
+    try:
+        read = [r[:len(EVENT_HEADER)] for r in ev.get_all_values()[1:]]
+        events = [dict(zip(EVENT_HEADER, r)) for r in read]
+        if all(e['시트'] == SHEET_EVENTS for e in events): return 0
         
-        combined = pd.concat([final_df, new_df], ignore_index=True)
-        combined = combined.fillna("")
+        for sheet_name in dict.fromkeys(e['시트'] for e in events if e['시트'] != SHEET_EVENTS):
+            try: sh = doc.worksheet(sheet_name); data = sh.get_all_records()
+            except: sh = doc.add_worksheet(sheet_name, 1000, 12); data = []
+            df = _fold_events(_norm_cols(pd.DataFrame(data)), sheet_name, events)
+            _overwrite_sheet(sh, df)
         
-        if '날짜' in combined.columns:
-            combined['날짜'] = pd.to_datetime(combined['날짜'], errors='coerce')
-            combined = combined.sort_values('날짜')
-            combined['날짜'] = combined['날짜'].dt.strftime("%Y-%m-%d")
-            
-        sh.clear()
-        sh.update([combined.columns.values.tolist()] + combined.values.tolist())
+        # 압축 표시를 먼저 남긴 뒤(다른 프로세스의 스냅샷 캐시 무효화) 읽은 이벤트와 내용이 같은 행만 삭제
+        _append_events([(SHEET_EVENTS, "compact", str(datetime.now()))])
+        _delete_read_events(ev, read)
+        _shared_bump(SHEET_EVENTS)
+        _load_snapshot.clear()
+        return len(events)
+    finally: _release_compact_lease(doc, token)
+
+def _acquire_compact_lease(doc, token, secs=600):
+    """압축잠금 시트에 보유자/만료 기록. 다른 보유자의 만료 전 잠금이 있으면 False"""
+    sh = _get_or_add_sheet(doc, SHEET_LOCK, ["보유자", "만료"])
+    cur = sh.row_values(2)
+    if len(cur) >= 2 and cur[0] and cur[0] != token and int(float(cur[1] or 0)) > time.time(): return False
+    sh.update(range_name="A2:B2", values=[[token, int(time.time()) + secs]])
+    # 동시에 잡은 경우 마지막에 쓴 쪽만 진행
+    return sh.row_values(2)[:1] == [token]
+
+def _release_compact_lease(doc, token):
+    try:
+        sh = doc.worksheet(SHEET_LOCK)
+        if sh.row_values(2)[:1] == [token]: sh.batch_clear(["A2:B2"])
+    except: pass
+
+def _delete_read_events(ev, read):
+    """위치가 아니라 내용으로 삭제: 다시 읽어서 읽었던 이벤트와 같은 행만 (아래쪽부터) 지움"""
+    pending = {}
+    for r in read: pending[tuple(r)] = pending.get(tuple(r), 0) + 1
+    hits = []
+    for i, r in enumerate(ev.get_all_values()[1:], start=2):
+        k = tuple(r[:len(EVENT_HEADER)])
+        if pending.get(k, 0) > 0: pending[k] -= 1; hits.append(i)
+    
+    # 연속 구간으로 묶어 아래부터 삭제 (행 번호 밀림 방지)
+    ranges = []
+    for i in hits:
+        if ranges and ranges[-1][1] == i - 1: ranges[-1][1] = i
+        else: ranges.append([i, i])
+    for a, b in reversed(ranges): ev.delete_rows(a, b)
+
+def save_plan_data(new_rows, header_list, insert_only=False):
+    """활동계획 저장 전용 (기존 로직 유지, insert_only: 이미 있는 계획은 유지)"""
+    return _save_general(SHEET_PLAN, new_rows, header_list, unique_cols=['날짜', '이름', '장소'], insert_only=insert_only)
+
+def _row_events(sheet_name, op, header_list, rows, unique_cols, limit=40000):
+    """행 목록을 셀 한도(50,000자)보다 작은 이벤트 여러 개로 나눔"""
+    events, chunk, size = [], [], 0
+    for r in rows:
+        n = len(json.dumps(r, ensure_ascii=False, default=_json_default)) + 1
+        if chunk and size + n > limit:
+            events.append((sheet_name, op, {"header": header_list, "rows": chunk, "unique": unique_cols}))
+            chunk, size = [], 0
+        chunk.append(r); size += n
+    if chunk: events.append((sheet_name, op, {"header": header_list, "rows": chunk, "unique": unique_cols}))
+    return events
+
+def _save_general(sheet_name, new_rows, header_list, unique_cols, insert_only=False):
+    try:
+        if EVENT_MODE:
+            # 여러 이벤트여도 append_rows 한 번
+            op = "insert_missing" if insert_only else "upsert"
+            _append_events(_row_events(sheet_name, op, header_list, new_rows, unique_cols))
+            return True
+        
+        doc = client.open("지질공원_운영일지_DB")
+        sh = _get_or_add_sheet(doc, sheet_name, header_list)
+        old_df = _norm_cols(pd.DataFrame(sh.get_all_records()))
+        combined = _upsert_rows(old_df, new_rows, header_list, unique_cols, insert_only)
+        _overwrite_sheet(sh, combined)
         return True
     except Exception as e:
         st.error(f"저장 오류 ({sheet_name}): {e}")
@@ -154,90 +598,176 @@ def save_daily_report(act_row, op_row):
     1. 활동일지(개인): 무조건 저장 (Append/Update)
     2. 운영일지(장소): [날짜+장소] 키로 조회하여 방문객 수는 Min값 적용, 비고는 합침
     """
+    # 헤더: 날짜, 섬, 장소, 이름, 활동시간, 활동내용, 청취자수, 해설횟수, 타임스탬프, 년, 월
+    act_header = ["날짜", "섬", "장소", "이름", "활동시간", "활동내용", "청취자수", "해설횟수", "타임스탬프", "년", "월"]
+    # 헤더: 날짜, 섬, 장소, 탐방객수, 특이사항, 타임스탬프, 년, 월
+    op_header = ["날짜", "섬", "장소", "탐방객수", "특이사항", "타임스탬프", "년", "월"]
+    op_note = None  # 시트에 저장된 최종 특이사항 (일반 모드에서만 알 수 있음)
     try:
-        doc = client.open("지질공원_운영일지_DB")
-        
-        # 1. 활동일지 저장 (Activity Log)
-        # 헤더: 날짜, 섬, 장소, 이름, 활동시간, 활동내용, 청취자수, 해설횟수, 타임스탬프, 년, 월
-        act_header = ["날짜", "섬", "장소", "이름", "활동시간", "활동내용", "청취자수", "해설횟수", "타임스탬프", "년", "월"]
-        _save_general(SHEET_ACTIVITY, [act_row], act_header, unique_cols=['날짜', '이름', '장소'])
-        
-        # 2. 운영일지 저장 (Operation Log) - 로직 적용
-        # 헤더: 날짜, 섬, 장소, 탐방객수, 특이사항, 타임스탬프, 년, 월
-        op_header = ["날짜", "섬", "장소", "탐방객수", "특이사항", "타임스탬프", "년", "월"]
-        
-        try: sh_op = doc.worksheet(SHEET_OPERATION)
-        except: 
-            sh_op = doc.add_worksheet(SHEET_OPERATION, 1000, len(op_header))
-            sh_op.append_row(op_header)
-            
-        op_data = sh_op.get_all_records()
-        df_op = pd.DataFrame(op_data)
-        if df_op.empty: df_op = pd.DataFrame(columns=op_header)
-        
-        # 입력값 파싱
-        in_date = op_row[0]
-        in_place = op_row[2]
-        in_visitors = int(op_row[3])
-        in_note = str(op_row[4])
-        
-        # 날짜 포맷 통일
-        df_op['d_str'] = pd.to_datetime(df_op['날짜'], errors='coerce').dt.strftime("%Y-%m-%d")
-        
-        # 중복 확인 (날짜+장소)
-        mask = (df_op['d_str'] == in_date) & (df_op['장소'] == in_place)
-        
-        if mask.any():
-            # 이미 데이터가 있음 -> '작은 수' 적용 로직
-            existing_idx = df_op[mask].index[0]
-            old_visitors = int(pd.to_numeric(df_op.at[existing_idx, '탐방객수'], errors='coerce') or 0)
-            old_note = str(df_op.at[existing_idx, '특이사항'])
-            
-            # [핵심] 더 작은 방문객 수 적용
-            final_visitors = min(old_visitors, in_visitors) if (old_visitors > 0 and in_visitors > 0) else max(old_visitors, in_visitors)
-            # 0이 아닌 값들 중 최소값, 둘다 0이면 0. (단, 한쪽이 0이면 입력 누락일 수 있으니 큰값? 사용자 요청은 '적은 수')
-            # 사용자 요청대로 무조건 작은 수 적용 (단, 0 입력 시 0이 될 위험 있음. 하지만 요청 준수)
-            # 만약 둘 중 하나가 0이라면? -> 0을 무시할지, 0을 적용할지.
-            # "같은 날에 2개의 데이터가 만들어지면 적은 수를 적용시켜" -> 
-            # 보통 50, 50 입력하면 50. 50, 60 입력하면 50.
-            # 50, 0 입력하면? 0이 됨. (사용자가 0으로 정정하고 싶을 수도 있음)
-            # 따라서 min() 그대로 사용.
-            final_visitors = min(old_visitors, in_visitors)
-            if old_visitors == 0 and in_visitors > 0: final_visitors = in_visitors # 기존이 0이면 새 값 (최초입력 간주)
-            elif old_visitors > 0 and in_visitors == 0: final_visitors = old_visitors # 새 값이 0이면 무시 (실수 방지)
-            elif old_visitors > 0 and in_visitors > 0: final_visitors = min(old_visitors, in_visitors)
-            
-            # 특이사항 합치기 (중복 아니면)
-            final_note = old_note
-            if in_note and in_note not in old_note:
-                final_note = f"{old_note} / {in_note}" if old_note else in_note
-                
-            # 업데이트
-            df_op.at[existing_idx, '탐방객수'] = final_visitors
-            df_op.at[existing_idx, '특이사항'] = final_note
-            df_op.at[existing_idx, '타임스탬프'] = str(datetime.now()) # 수정시간
-            
+        if EVENT_MODE:
+            # 두 이벤트를 한 번에 추가
+            _append_events([
+                (SHEET_ACTIVITY, "upsert", {"header": act_header, "rows": [act_row], "unique": ['날짜', '이름', '장소']}),
+                (SHEET_OPERATION, "op_merge", {"header": op_header, "row": op_row}),
+            ])
         else:
-            # 신규 추가
-            new_df = pd.DataFrame([op_row], columns=op_header)
-            df_op = pd.concat([df_op, new_df], ignore_index=True)
+            doc = client.open("지질공원_운영일지_DB")
             
-        # 정리 후 저장
-        if 'd_str' in df_op.columns: df_op = df_op.drop(columns=['d_str'])
-        df_op = df_op.fillna("")
-        sh_op.clear()
-        sh_op.update([df_op.columns.values.tolist()] + df_op.values.tolist())
+            # 1. 활동일지 저장 (Activity Log)
+            _save_general(SHEET_ACTIVITY, [act_row], act_header, unique_cols=['날짜', '이름', '장소'])
+            
+            # 2. 운영일지 저장 (Operation Log) - 로직 적용
+            sh_op = _get_or_add_sheet(doc, SHEET_OPERATION, op_header)
+            df_op = _norm_cols(pd.DataFrame(sh_op.get_all_records()))
+            df_op = _merge_op_row(df_op, op_row, op_header)
+            _overwrite_sheet(sh_op, df_op)
+            hit = df_op.loc[_match_mask(df_op, {'날짜': op_row[0], '장소': op_row[2]}), '특이사항']
+            if len(hit): op_note = str(hit.iloc[0])
         
+        # 3. 검색 색인 갱신 (실패해도 저장은 유지)
+        index_daily_report(act_row, op_row, op_note)
         return True
     except Exception as e:
         st.error(f"저장 중 오류 발생: {e}")
         return False
 
+def delete_plan_row(target_d, target_u, t_place):
+    """활동계획 한 건 삭제 (취소)"""
+    match = {"날짜": target_d, "이름": target_u, "장소": t_place}
+    if EVENT_MODE:
+        _append_events([(SHEET_PLAN, "delete", {"match": match})]); return
+    sh = client.open("지질공원_운영일지_DB").worksheet(SHEET_PLAN)
+    ald = _norm_cols(pd.DataFrame(sh.get_all_records()))
+    _overwrite_sheet(sh, ald[~_match_mask(ald, match)])
+
+def approve_plan(t_place, dates_str):
+    """장소+기간 계획 승인 (상태 = 승인완료)"""
+    match = {"장소": t_place, "날짜": list(dates_str)}
+    if EVENT_MODE:
+        _append_events([(SHEET_PLAN, "set", {"match": match, "values": {"상태": "승인완료"}})]); return
+    sh = client.open("지질공원_운영일지_DB").worksheet(SHEET_PLAN)
+    ald = _norm_cols(pd.DataFrame(sh.get_all_records()))
+    if '상태' not in ald.columns: ald['상태'] = ""
+    ald.loc[_match_mask(ald, match), '상태'] = "승인완료"
+    _overwrite_sheet(sh, ald.fillna(""))
+
+def expand_templates(df_tpl, names, year, month, periods):
+    """템플릿(요일 반복) x 해설사 x 기간 -> 활동계획 행 목록"""
+    _, last = calendar.monthrange(year, month)
+    days = []
+    for pr in periods: days += list(range(1, 16) if "전반기" in pr else range(16, last+1))
+    now = str(datetime.now()); rows = []
+    for _, t in df_tpl.iterrows():
+        wds = [x.strip() for x in str(t['요일']).split(',')]
+        for d in sorted(set(days)):
+            dt = datetime(year, month, d)
+            if DAY_MAP[dt.weekday()] not in wds: continue
+            for n in names:
+                rows.append([dt.strftime("%Y-%m-%d"), t['섬'], t['장소'], n, t['활동여부'], f"템플릿:{t['템플릿명']}", now, year, month, "", "", ""])
+    return rows
+
+def apply_plan_templates(df_tpl, names, year, month, periods):
+    """
+    템플릿 일괄 적용. 이미 있는 (날짜, 이름, 장소) 계획은 저장 시점에 확인해 건드리지 않음 (한 번에 저장)
+    반환: 적용 대상 행 수 (저장 시 건너뛴 기존 계획 포함, 실패 시 0)
+    """
+    rows = expand_templates(df_tpl, names, year, month, periods)
+    if not rows: return 0
+    new_df = pd.DataFrame(rows, columns=PLAN_HEADER).drop_duplicates(['날짜', '이름', '장소'])
+    if not save_plan_data(new_df.values.tolist(), PLAN_HEADER, insert_only=True): return 0
+    return len(new_df)
+
+# ---------------------------------------------------------
+# 검색 색인 (SQLite 역색인, 낱글자 + 2글자 n-gram)
+# ---------------------------------------------------------
+def _search_db():
+    con = sqlite3.connect(SEARCH_INDEX_PATH, timeout=10)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("CREATE TABLE IF NOT EXISTS docs (doc_id TEXT PRIMARY KEY, sheet TEXT, date TEXT, island TEXT, place TEXT, name TEXT, text TEXT)")
+    con.execute("CREATE TABLE IF NOT EXISTS postings (token TEXT, doc_id TEXT, PRIMARY KEY (token, doc_id)) WITHOUT ROWID")
+    con.execute("CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id)")
+    return con
+
+def _tokens(text):
+    """단어(공백/쉼표/문장부호 기준) 안에서 낱글자 + 2글자 조각"""
+    toks = set()
+    for w in re.findall(r"\w+", str(text).lower()):
+        toks.update(w)
+        toks.update(w[i:i+2] for i in range(len(w) - 1))
+    return toks
+
+def _index_put(con, doc_id, sheet, date, island, place, name, text):
+    con.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+    if not str(text).strip():
+        con.execute("DELETE FROM docs WHERE doc_id = ?", (doc_id,)); return
+    con.execute("INSERT OR REPLACE INTO docs VALUES (?, ?, ?, ?, ?, ?, ?)", (doc_id, sheet, date, island, place, name, str(text)))
+    con.executemany("INSERT OR IGNORE INTO postings VALUES (?, ?)", [(t, doc_id) for t in _tokens(text)])
+
+def index_daily_report(act_row, op_row, op_note=None):
+    """
+    저장된 일지 한 건을 색인에 반영
+    op_note: 시트에 저장된 최종 특이사항 (일반 모드). 없으면 (이벤트 모드) 색인에 있던 내용과 시트와 같은 규칙으로 합침
+    -> 이벤트 모드나 색인 쓰기 실패 뒤에는 재구축해야 운영일지 특이사항이 시트와 같아짐
+    """
+    try:
+        with closing(_search_db()) as con, con:
+            d, isl, place, name = act_row[0], act_row[1], act_row[2], act_row[3]
+            _index_put(con, f"{SHEET_ACTIVITY}|{d}|{place}|{name}", SHEET_ACTIVITY, d, isl, place, name, act_row[5])
+            
+            op_id = f"{SHEET_OPERATION}|{op_row[0]}|{op_row[2]}"
+            note = op_note
+            if note is None:
+                old = (con.execute("SELECT text FROM docs WHERE doc_id = ?", (op_id,)).fetchone() or [""])[0]
+                _, note = _merge_op_values(0, old, 0, str(op_row[4]))
+            _index_put(con, op_id, SHEET_OPERATION, op_row[0], op_row[1], op_row[2], "", note)
+    except sqlite3.Error: pass
+
+def rebuild_search_index():
+    """
+    시트 전체로 색인 재구축 (최초 1회 또는 시트를 직접 수정한 뒤). 반환: 색인 문서 수
+    시트를 모두 읽은 뒤 짧은 트랜잭션 하나로 교체 (읽는 동안 다른 사용자의 색인 쓰기를 막지 않음)
+    """
+    docs = []
+    for sheet_name, col in [(SHEET_ACTIVITY, '활동내용'), (SHEET_OPERATION, '특이사항')]:
+        df = load_data(sheet_name)
+        if df.empty or col not in df.columns: continue
+        df = df[df[col].astype(str).str.strip() != ""]
+        for _, r in df.iterrows():
+            d = r['날짜'].strftime("%Y-%m-%d"); name = str(r.get('이름', ''))
+            doc_id = f"{sheet_name}|{d}|{r['장소']}" + (f"|{name}" if sheet_name == SHEET_ACTIVITY else "")
+            docs.append((doc_id, sheet_name, d, r.get('섬', ''), r['장소'], name, r[col]))
+    
+    with closing(_search_db()) as con, con:
+        con.execute("DELETE FROM postings"); con.execute("DELETE FROM docs")
+        for doc in docs: _index_put(con, *doc)
+    return len(docs)
+
+def search_notes(query, island=None, place=None, d_from=None, d_to=None, limit=500):
+    """검색어의 모든 단어를 포함하는 일지 (n-gram 교집합 후 원문 확인)"""
+    words = re.findall(r"\w+", str(query).lower())
+    if not words: return pd.DataFrame()
+    toks = set()
+    for w in words: toks.update([w] if len(w) == 1 else (w[i:i+2] for i in range(len(w) - 1)))
+    
+    sql = ("SELECT d.date, d.sheet, d.island, d.place, d.name, d.text FROM docs d JOIN "
+           f"(SELECT doc_id FROM postings WHERE token IN ({','.join('?' * len(toks))}) GROUP BY doc_id HAVING COUNT(*) = ?) p "
+           "ON p.doc_id = d.doc_id WHERE 1 = 1")
+    args = list(toks) + [len(toks)]
+    if island: sql += " AND d.island = ?"; args.append(island)
+    if place: sql += " AND d.place = ?"; args.append(place)
+    if d_from: sql += " AND d.date >= ?"; args.append(str(d_from))
+    if d_to: sql += " AND d.date <= ?"; args.append(str(d_to))
+    sql += " ORDER BY d.date DESC"
+    
+    with closing(_search_db()) as con:
+        rows = con.execute(sql, args).fetchall()
+    rows = [r for r in rows if all(w in r[5].lower() for w in words)][:limit]
+    return pd.DataFrame(rows, columns=["날짜", "구분", "섬", "장소", "이름", "내용"])
+
 def get_users(island):
     try:
-        sh = client.open("지질공원_운영일지_DB").worksheet("사용자")
-        users = sh.get_all_records()
-        return [u['이름'] for u in users if u.get('섬') == island]
+        df = load_data(SHEET_USERS, island=island, columns=['이름', '섬'])
+        return df['이름'].tolist() if not df.empty else []
     except: return []
 
 # =========================================================
@@ -308,6 +838,61 @@ def get_display_data(df_plan, df_act, date_list):
         disp_rows.append(row_dat)
     return disp_rows
 
+def get_plan_matrix(df_plan, df_act, places, date_list, place_island=None):
+    """
+    안내소 × 날짜 현황표 (계획/실적 인원). 장소별 반복 없이 한 번의 피벗으로 계산
+    행 순서는 places 순서, place_island({장소: 섬}) 지정 시 섬을 첫 번째 인덱스로 표시
+    반환: (표시용 DataFrame, 미배치 마스크, 대타 마스크)
+    """
+    days = pd.to_datetime(pd.Series(date_list)).dt.normalize()
+    col_names = [f"{d.day:02d}({DAY_MAP[d.weekday()]})" for d in days]
+    idx = pd.MultiIndex.from_product([places, days], names=['장소', '날짜'])
+
+    def _pivot(counts):
+        # (장소, 날짜) 카운트 -> 장소 × 날짜 표 (빈 칸은 0)
+        mat = counts.reindex(idx, fill_value=0).unstack('날짜').reindex(places) # unstack 의 가나다 정렬 대신 LOCATIONS 순서
+        mat.columns = col_names
+        if place_island:
+            mat.index = pd.MultiIndex.from_arrays([[place_island.get(p, "") for p in places], places], names=['섬', '장소'])
+        return mat.astype(int)
+
+    planned = subs = actual = pd.Series(0, index=idx)
+    if not df_plan.empty:
+        p = df_plan[['날짜', '장소', '이름', '활동여부', '대타여부', '기존해설사']].copy()
+        p['날짜'] = pd.to_datetime(p['날짜'], errors='coerce').dt.normalize()
+        p = p[p['활동여부'].astype(str).str.strip() != ""] # 계획입력 그리드의 빈 날(휴무)은 제외
+        is_sub = p['대타여부'] == 'O'
+        # 대타로 교체된 기존해설사는 계획 인원에서 제외 (get_display_data 와 동일 규칙)
+        replaced = p.loc[is_sub, ['날짜', '장소', '기존해설사']].rename(columns={'기존해설사': '이름'}).drop_duplicates()
+        p = p.merge(replaced.assign(_rep=True), on=['날짜', '장소', '이름'], how='left')
+        p = p[(p['대타여부'] == 'O') | p['_rep'].isna()]
+        planned = p.groupby(['장소', '날짜']).size()
+        subs = p[p['대타여부'] == 'O'].groupby(['장소', '날짜']).size()
+    if not df_act.empty:
+        a = df_act[['날짜', '장소', '이름', '활동시간']].copy()
+        a['날짜'] = pd.to_datetime(a['날짜'], errors='coerce').dt.normalize()
+        a = a[a['활동시간'].astype(str).str.strip() != ""]
+        actual = a.drop_duplicates(['날짜', '장소', '이름']).groupby(['장소', '날짜']).size()
+
+    m_plan = _pivot(planned); m_sub = _pivot(subs); m_act = _pivot(actual)
+    disp = m_plan.astype(str) + "/" + m_act.astype(str)
+    disp = disp.where(m_sub == 0, disp + " 🔄")
+    return disp, m_plan == 0, m_sub > 0
+
+def query_activity(df, place=None, name_q="", d_from=None, d_to=None, sort_col="날짜", ascending=True):
+    """활동일지 필터/정렬 (서버에서 처리, 화면에는 한 페이지만 전송)"""
+    if df.empty: return df
+    mask = pd.Series(True, index=df.index)
+    if place: mask &= df['장소'] == place
+    if name_q: mask &= df['이름'].astype(str).str.contains(name_q, regex=False)
+    if d_from: mask &= df['날짜'] >= pd.to_datetime(d_from)
+    if d_to: mask &= df['날짜'] <= pd.to_datetime(d_to)
+    # 숫자 컬럼은 "" 가 섞여 있어 숫자로 변환 후 정렬, 나머지는 문자열로 정렬
+    if sort_col in ("활동시간", "청취자수", "해설횟수"): key = lambda s: pd.to_numeric(s, errors='coerce')
+    elif sort_col == '날짜': key = None
+    else: key = lambda s: s.astype(str)
+    return df[mask].sort_values(sort_col, ascending=ascending, kind="stable", key=key)
+
 def generate_pdf(target_place, special_note, p_year, p_month, p_range, disp_rows, current_island):
     font_path = "NanumGothic.ttf"
     if not os.path.exists(font_path): st.error("폰트 없음"); return None
@@ -389,6 +974,53 @@ def generate_pdf(target_place, special_note, p_year, p_month, p_range, disp_rows
 # 4. UI 탭별 함수
 # =========================================================
 
+def _journal_day_form(form_key, pick_s, island, place, name, r, r_op, jy, jm):
+    """하루 일지 입력 폼 (r: 활동일지 행, r_op: 운영일지 행, 없으면 None)"""
+    pt="활동 없음"; p_acts=[]; pv=0; pl=0; pc=0; pspec=""
+    if r is not None:
+        tv = str(r['활동시간'])
+        if tv=="8": pt="종일 (8시간)"
+        elif tv=="4": pt="반일 (4시간)"
+        raw_act = str(r.get('활동내용', ''))
+        p_acts = [x.strip() for x in raw_act.split(',')] if raw_act else []
+        pl = int(r.get('청취자수', 0) or 0)
+        pc = int(r.get('해설횟수', 0) or 0)
+    if r_op is not None:
+        pv = int(r_op['탐방객수'] or 0)
+        pspec = str(r_op['특이사항'])
+
+    with st.form(form_key):
+        st.markdown("**1. 활동 시간**")
+        st_sel = st.radio("시간", ["활동 없음", "종일 (8시간)", "반일 (4시간)"], index=["활동 없음", "종일 (8시간)", "반일 (4시간)"].index(pt), horizontal=True)
+        
+        st.markdown("**2. 활동 내용 (체크)**")
+        act_opts = ["시설점검", "환경정비", "교육"]
+        cols_act = st.columns(3)
+        sel_acts = []
+        for idx, opt in enumerate(act_opts):
+            if cols_act[idx].checkbox(opt, value=(opt in p_acts)): sel_acts.append(opt)
+        
+        st.markdown("**3. 실적 입력**")
+        c_n1, c_n2, c_n3 = st.columns(3)
+        iv = c_n1.number_input("탐방객(명) *장소 통합", value=pv, min_value=0)
+        il = c_n2.number_input("청취자(명)", value=pl, min_value=0)
+        ic = c_n3.number_input("해설횟수(회)", value=pc, min_value=0)
+        
+        st.markdown("**4. 특이사항 *장소 통합**")
+        ispec = st.text_area("내용", value=pspec, height=80)
+        
+        if st.form_submit_button("💾 저장"):
+            ft = 8 if "8시간" in st_sel else (4 if "4시간" in st_sel else "")
+            act_str = ",".join(sel_acts)
+            
+            # 활동일지 Row
+            act_r = [pick_s, island, place, name, ft, act_str, il, ic, str(datetime.now()), jy, jm]
+            # 운영일지 Row
+            op_r = [pick_s, island, place, iv, ispec, str(datetime.now()), jy, jm]
+            
+            if save_daily_report(act_r, op_r):
+                st.success("저장 완료!"); time.sleep(0.5); st.rerun()
+
 def ui_journal_write(name, island):
     st.header("📝 운영일지 작성")
     now = datetime.now()
@@ -414,59 +1046,20 @@ def ui_journal_write(name, island):
             pick = st.date_input("날짜", value=def_d, key="jw_pk")
             pick_s = pick.strftime("%Y-%m-%d")
         
-        pt="활동 없음"; p_acts=[]; pv=0; pl=0; pc=0; pspec=""
+        r = None
         if not df.empty:
-            r = df[df['날짜']==pd.to_datetime(pick_s)]
-            if not r.empty:
-                r = r.iloc[0]
-                tv = str(r['활동시간'])
-                if tv=="8": pt="종일 (8시간)"
-                elif tv=="4": pt="반일 (4시간)"
-                raw_act = str(r.get('활동내용', ''))
-                p_acts = [x.strip() for x in raw_act.split(',')] if raw_act else []
-                pl = int(r.get('청취자수', 0) or 0)
-                pc = int(r.get('해설횟수', 0) or 0)
+            rr = df[df['날짜']==pd.to_datetime(pick_s)]
+            if not rr.empty: r = rr.iloc[0]
         
         # 운영일지 로드 (탐방객, 특이사항)
+        r_op = None
         df_op = load_data(SHEET_OPERATION, jy, jm, island)
         if not df_op.empty:
-            r_op = df_op[(df_op['날짜']==pd.to_datetime(pick_s)) & (df_op['장소']==place)]
-            if not r_op.empty:
-                pv = int(r_op.iloc[0]['탐방객수'] or 0)
-                pspec = str(r_op.iloc[0]['특이사항'])
+            rr = df_op[(df_op['날짜']==pd.to_datetime(pick_s)) & (df_op['장소']==place)]
+            if not rr.empty: r_op = rr.iloc[0]
 
         with c_d2: st.markdown(f"**{pick.day}일 ({DAY_MAP[pick.weekday()]})**")
-        with st.form("jw_form"):
-            st.markdown("**1. 활동 시간**")
-            st_sel = st.radio("시간", ["활동 없음", "종일 (8시간)", "반일 (4시간)"], index=["활동 없음", "종일 (8시간)", "반일 (4시간)"].index(pt), horizontal=True)
-            
-            st.markdown("**2. 활동 내용 (체크)**")
-            act_opts = ["시설점검", "환경정비", "교육"]
-            cols_act = st.columns(3)
-            sel_acts = []
-            for idx, opt in enumerate(act_opts):
-                if cols_act[idx].checkbox(opt, value=(opt in p_acts)): sel_acts.append(opt)
-            
-            st.markdown("**3. 실적 입력**")
-            c_n1, c_n2, c_n3 = st.columns(3)
-            iv = c_n1.number_input("탐방객(명) *장소 통합", value=pv, min_value=0)
-            il = c_n2.number_input("청취자(명)", value=pl, min_value=0)
-            ic = c_n3.number_input("해설횟수(회)", value=pc, min_value=0)
-            
-            st.markdown("**4. 특이사항 *장소 통합**")
-            ispec = st.text_area("내용", value=pspec, height=80)
-            
-            if st.form_submit_button("💾 저장"):
-                ft = 8 if "8시간" in st_sel else (4 if "4시간" in st_sel else "")
-                act_str = ",".join(sel_acts)
-                
-                # 활동일지 Row
-                act_r = [pick_s, island, place, name, ft, act_str, il, ic, str(datetime.now()), jy, jm]
-                # 운영일지 Row
-                op_r = [pick_s, island, place, iv, ispec, str(datetime.now()), jy, jm]
-                
-                if save_daily_report(act_r, op_r):
-                    st.success("저장 완료!"); time.sleep(0.5); st.rerun()
+        _journal_day_form("jw_form", pick_s, island, place, name, r, r_op, jy, jm)
     else:
         st.info("PC 모드 (간략 입력)")
         grid = []
@@ -491,22 +1084,76 @@ def ui_journal_write(name, island):
                     save_daily_report(act_r, op_r)
                 st.success("완료"); st.rerun()
 
+def lite_choice():
+    """명시적 선택 (사이드바 전환 > 주소 ?lite=1/0). 선택이 없으면 None"""
+    if st.session_state.get('lite_pref') is not None: return st.session_state['lite_pref']
+    try:
+        q = st.query_params.get("lite")
+        if q in ("1", "0"): return q == "1"
+    except: pass
+    return None
+
+def is_lite(user=None):
+    """명시적 선택이 우선, 없으면 사용자 시트 '모드' 컬럼 또는 브라우저 데이터 절약 모드(Save-Data: on)"""
+    choice = lite_choice()
+    if choice is not None: return choice
+    if user and str(user.get('모드', '')).strip().lower() in ("라이트", "lite"): return True
+    try: return str(st.context.headers.get("Save-Data", "")).lower() == "on"
+    except: return False
+
+def ui_journal_lite(name, island):
+    """라이트 모드: 오늘 하루 일지 폼만 (표/그리드 없음, 오늘 내 행만 조회)"""
+    today = datetime.now(); pick_s = today.strftime("%Y-%m-%d")
+    st.markdown(f"**📝 {today.month}/{today.day} ({DAY_MAP[today.weekday()]}) 일지**")
+    place = st.selectbox("장소", LOCATIONS.get(island, []), key="jl_p")
+    r = load_row(SHEET_ACTIVITY, {"날짜": pick_s, "이름": name, "장소": place})
+    r_op = load_row(SHEET_OPERATION, {"날짜": pick_s, "장소": place})
+    _journal_day_form("jl_form", pick_s, island, place, name, r, r_op, today.year, today.month)
+
 def ui_view_journal(scope, name, island):
     st.header("🔍 활동 조회")
+    now = datetime.now(); _, last = calendar.monthrange(now.year, now.month)
     c1, c2 = st.columns(2)
-    with c1: vy = st.number_input("연도", value=datetime.now().year, key="vj_y")
-    with c2: vm = st.number_input("월", value=datetime.now().month, key="vj_m")
+    with c1: rng = st.date_input("기간", value=(now.replace(day=1).date(), now.replace(day=last).date()), key="vj_rng")
+    d_from, d_to = (rng[0], rng[-1]) if isinstance(rng, (list, tuple)) and rng else (rng, rng)
     
-    t_isl = island if scope != "all" else None
-    df = load_data(SHEET_ACTIVITY, vy, vm, t_isl) # 활동일지 로드
+    # 필터 (섬/장소/이름)
+    t_isl = island; place = None; name_q = ""
+    if scope == "all":
+        with c2: sel_isl = st.selectbox("섬", ["전체"] + list(LOCATIONS.keys()), key="vj_i")
+        t_isl = None if sel_isl == "전체" else sel_isl
+    if scope != "me":
+        c3, c4 = st.columns(2)
+        p_opts = LOCATIONS.get(t_isl, []) if t_isl else [p for ps in LOCATIONS.values() for p in ps]
+        with c3: sel_p = st.selectbox("장소", ["전체"] + p_opts, key="vj_p")
+        with c4: name_q = st.text_input("이름", key="vj_n")
+        place = None if sel_p == "전체" else sel_p
     
+    df = load_data(SHEET_ACTIVITY, island=t_isl, columns=JOURNAL_COLS) # 활동일지 (표시 컬럼만)
     if df.empty: st.info("데이터가 없습니다."); return
     if scope == "me": df = df[df['이름'] == name]
     
-    st.dataframe(df, use_container_width=True, hide_index=True, column_config={
-        "타임스탬프": None, "년": None, "월": None, "키": None, "key": None,
+    c5, c6, c7 = st.columns([2, 1, 1])
+    with c5: sort_col = st.selectbox("정렬", [c for c in JOURNAL_COLS if c in df.columns], key="vj_s")
+    with c6: asc = st.radio("순서", ["오름차순", "내림차순"], horizontal=True, key="vj_so") == "오름차순"
+    with c7: size = st.selectbox("페이지당", [50, 100, 200], key="vj_sz")
+    
+    res = query_activity(df, place, name_q, d_from, d_to, sort_col, asc)
+    if res.empty: st.info("조건에 맞는 데이터가 없습니다."); return
+    
+    pages = max(1, -(-len(res) // size))
+    # 페이지 값은 세션 상태로만 지정 (value= 와 함께 쓰면 경고 + 값 충돌)
+    if st.session_state.get("vj_pg", 0) not in range(1, pages + 1): st.session_state["vj_pg"] = 1
+    page = st.number_input("페이지", min_value=1, max_value=pages, key="vj_pg")
+    st.caption(f"총 {len(res):,}건 · {page}/{pages}쪽")
+    st.dataframe(res.iloc[(page-1)*size : page*size], use_container_width=True, hide_index=True, column_config={
         "날짜": st.column_config.DateColumn("날짜", format="YYYY-MM-DD")
     })
+    
+    # CSV는 요청 시에만 생성 (매 새로고침마다 전체 결과를 보내지 않음)
+    if st.button("📄 CSV 만들기", key="vj_csv"):
+        out = res.copy(); out['날짜'] = out['날짜'].dt.strftime("%Y-%m-%d")
+        st.download_button("📥 CSV 다운로드", out.to_csv(index=False).encode("utf-8-sig"), f"활동일지_{d_from}_{d_to}.csv", "text/csv", key="vj_dl")
 
 def ui_plan_input(name, island):
     st.header("✍️ 계획 입력")
@@ -580,6 +1227,50 @@ def ui_plan_input(name, island):
                 cols = ["날짜","섬","장소","이름","활동여부","비고","타임스탬프","년","월","상태","대타여부","기존해설사"]
                 save_plan_data(rows, cols); st.success("완료"); st.rerun()
 
+def ui_plan_template(name, island, role):
+    st.header("🔁 반복 계획 템플릿")
+    tis = island
+    if role == "관리자": tis = st.selectbox("섬", list(LOCATIONS.keys()), key="tp_isl")
+    
+    df_tpl = load_data(SHEET_TEMPLATE, island=tis)
+    
+    with st.expander("➕ 템플릿 등록", expanded=df_tpl.empty):
+        with st.form("tp_new"):
+            c1, c2 = st.columns(2)
+            t_name = c1.text_input("템플릿명 (예: 주말 종일)")
+            t_place = c2.selectbox("장소", LOCATIONS.get(tis, []))
+            t_days = st.multiselect("요일", list(DAY_MAP.values()), default=["토", "일"])
+            t_stat = st.radio("계획", ["종일", "오전(4시간)", "오후(4시간)"], horizontal=True)
+            if st.form_submit_button("💾 등록"):
+                if not t_name or not t_days: st.warning("템플릿명과 요일을 입력하세요")
+                else:
+                    row = [t_name, tis, t_place, ",".join(t_days), t_stat, name, str(datetime.now())]
+                    _save_general(SHEET_TEMPLATE, [row], TEMPLATE_HEADER, unique_cols=['템플릿명', '섬', '장소'])
+                    st.success("등록 완료"); st.rerun()
+    
+    if df_tpl.empty: st.info("등록된 템플릿이 없습니다."); return
+    st.dataframe(df_tpl[["템플릿명", "장소", "요일", "활동여부", "작성자"]], use_container_width=True, hide_index=True)
+    
+    st.divider()
+    st.subheader("📌 일괄 적용")
+    now = datetime.now(); nm = now.replace(day=28) + pd.Timedelta(days=4)
+    with st.form("tp_apply"):
+        c1, c2 = st.columns(2)
+        ay = c1.number_input("연도", value=nm.year)
+        am = c2.number_input("월", value=nm.month, min_value=1, max_value=12)
+        a_prs = st.multiselect("기간", ["전반기(1~15일)", "후반기(16~말일)"], default=["전반기(1~15일)", "후반기(16~말일)"])
+        # 같은 이름을 여러 안내소에 등록할 수 있으므로 이름 + 장소로 선택
+        tpl_labels = (df_tpl['템플릿명'].astype(str) + " (" + df_tpl['장소'].astype(str) + ")").tolist()
+        a_tpls = st.multiselect("템플릿", tpl_labels)
+        a_names = st.multiselect("해설사", get_users(tis))
+        st.caption("이미 계획이 있는 날짜(같은 이름·장소)는 그대로 둡니다.")
+        if st.form_submit_button("📌 적용"):
+            sel = df_tpl[[l in a_tpls for l in tpl_labels]]
+            if sel.empty or not a_names or not a_prs: st.warning("템플릿, 해설사, 기간을 선택하세요")
+            else:
+                n = apply_plan_templates(sel, a_names, int(ay), int(am), a_prs)
+                if n: st.success(f"템플릿 대상 {n}건 저장 완료 (그중 이미 계획이 있던 날은 건너뜀)")
+
 def ui_view_plan(scope, name, island, role=""):
     st.header("🗓️ 계획 조회 및 수정")
     c1, c2 = st.columns(2)
@@ -588,16 +1279,38 @@ def ui_view_plan(scope, name, island, role=""):
     with c2: pm = st.number_input("월", value=now.month, key="vp_m")
     
     sel_place = None
+    view = "상세"
     if scope == "team" or scope == "all":
-        t_isl = island if scope == "team" else st.selectbox("섬", list(LOCATIONS.keys()), key="vp_i")
-        place_list = LOCATIONS.get(t_isl, [])
-        sel_place = st.selectbox("안내소 선택 (상세조회)", place_list, key="vp_p")
+        isl_opts = list(LOCATIONS.keys()) + (["전체"] if scope == "all" else [])
+        t_isl = island if scope == "team" else st.selectbox("섬", isl_opts, key="vp_i")
+        view = st.radio("보기", ["📋 전체 안내소 현황", "🔎 안내소 상세"], horizontal=True, key="vp_v")
+        if "상세" in view:
+            if t_isl == "전체": st.info("상세조회는 섬을 선택하세요"); return
+            place_list = LOCATIONS.get(t_isl, [])
+            sel_place = st.selectbox("안내소 선택 (상세조회)", place_list, key="vp_p")
     else:
         t_isl = island
 
-    df_plan = load_data(SHEET_PLAN, py, pm, t_isl)
-    df_act = load_data(SHEET_ACTIVITY, py, pm, t_isl) # 결과는 활동일지에서
-    
+    l_isl = None if t_isl == "전체" else t_isl
+    df_plan = load_data(SHEET_PLAN, py, pm, l_isl)
+    df_act = load_data(SHEET_ACTIVITY, py, pm, l_isl) # 결과는 활동일지에서
+
+    if "현황" in view:
+        # 안내소 × 날짜 현황표 (한 번 로드 후 피벗)
+        places = [p for isl in (LOCATIONS if l_isl is None else [l_isl]) for p in LOCATIONS[isl]]
+        _, last = calendar.monthrange(py, pm)
+        m_dates = [datetime(py, pm, d) for d in range(1, last+1)]
+        p_isl = {p: isl for isl, ps in LOCATIONS.items() for p in ps} if l_isl is None else None
+        disp, uncovered, subbed = get_plan_matrix(df_plan, df_act, places, m_dates, p_isl)
+        st.caption("칸 = 계획/실적 인원 · 🟥 미배치 · 🟨 대타")
+
+        def _hl(_):
+            sty = pd.DataFrame("", index=disp.index, columns=disp.columns)
+            sty = sty.mask(subbed, "background-color: #fff3c4")
+            return sty.mask(uncovered, "background-color: #ffd6d6")
+        st.dataframe(disp.style.apply(_hl, axis=None), use_container_width=True)
+        return
+
     if df_plan.empty: st.info("데이터 없음"); return
     
     if sel_place:
@@ -670,14 +1383,7 @@ def ui_view_plan(scope, name, island, role=""):
                         save_plan_data([list(row.values())], cols)
                         st.success("완료"); time.sleep(1); st.rerun()
                     elif "취소" in act:
-                        sh = client.open("지질공원_운영일지_DB").worksheet(SHEET_PLAN)
-                        ald = pd.DataFrame(sh.get_all_records())
-                        ald.columns = [str(c).strip() for c in ald.columns]
-                        if '일자' in ald.columns: ald.rename(columns={'일자': '날짜'}, inplace=True)
-                        ald['d_str'] = pd.to_datetime(ald['날짜'], errors='coerce').dt.strftime("%Y-%m-%d")
-                        mask = (ald['d_str']==target_d) & (ald['이름']==target_u) & (ald['장소']==t_place)
-                        rem = ald[~mask].drop(columns=['d_str'])
-                        sh.clear(); sh.update([rem.columns.values.tolist()] + rem.values.tolist())
+                        delete_plan_row(target_d, target_u, t_place)
                         st.success("삭제 완료"); time.sleep(1); st.rerun()
                 except Exception as e: st.error(f"오류: {e}")
 
@@ -715,22 +1421,10 @@ def ui_approve(island, role):
     with c_btn1:
         if st.button("💾 승인 저장"):
             try:
-                raw_df = load_data(SHEET_PLAN, py, pm, tis)
-                if raw_df.empty:
+                if df.empty:
                     st.warning("데이터 없음")
                 else:
-                    raw_df['d_temp'] = raw_df['날짜'].dt.strftime("%Y-%m-%d")
-                    mask = (raw_df['장소'] == tpl) & (raw_df['d_temp'].isin(dates_str))
-                    raw_df.loc[mask, '상태'] = "승인완료"
-                    save_rows = []
-                    for _, r in raw_df.iterrows():
-                        d_s = r['날짜'].strftime("%Y-%m-%d")
-                        row = [d_s, r['섬'], r['장소'], r['이름'], r['활동여부'], r['비고'], str(r['타임스탬프']), r['년'], r['월'], r['상태'], r['대타여부'], r['기존해설사']]
-                        save_rows.append(row)
-                    
-                    sh = client.open("지질공원_운영일지_DB").worksheet(SHEET_PLAN)
-                    cols = ["날짜","섬","장소","이름","활동여부","비고","타임스탬프","년","월","상태","대타여부","기존해설사"]
-                    sh.clear(); sh.update([cols] + save_rows)
+                    approve_plan(tpl, dates_str)
                     st.success("완료!")
             except Exception as e: st.error(f"오류: {e}")
             
@@ -738,6 +1432,32 @@ def ui_approve(island, role):
         pdf_data = generate_pdf(tpl, note, py, pm, pr, disp_rows, tis)
         if pdf_data: st.download_button("📥 PDF 다운로드", pdf_data, f"운영계획서_{tpl}_{pm}월.pdf", "application/pdf")
 
+def ui_search(scope, island):
+    st.header("🔎 일지 검색")
+    q = st.text_input("검색어 (예: 낙석, 시설 파손)", key="sr_q")
+    c1, c2, c3 = st.columns([1, 2, 2])
+    t_isl = island
+    if scope == "all":
+        with c1: sel_isl = st.selectbox("섬", ["전체"] + list(LOCATIONS.keys()), key="sr_i")
+        t_isl = None if sel_isl == "전체" else sel_isl
+    p_opts = LOCATIONS.get(t_isl, []) if t_isl else [p for ps in LOCATIONS.values() for p in ps]
+    with c2: sel_p = st.selectbox("장소", ["전체"] + p_opts, key="sr_p")
+    with c3: rng = st.date_input("기간", value=(datetime(2020, 1, 1).date(), datetime.now().date()), key="sr_rng")
+    d_from, d_to = (rng[0], rng[-1]) if isinstance(rng, (list, tuple)) and rng else (rng, rng)
+    
+    if q:
+        t0 = time.perf_counter()
+        res = search_notes(q, t_isl, None if sel_p == "전체" else sel_p, d_from, d_to)
+        st.caption(f"{len(res):,}건 · {(time.perf_counter() - t0) * 1000:.0f}ms")
+        if res.empty: st.info("검색 결과가 없습니다.")
+        else: st.dataframe(res, use_container_width=True, hide_index=True)
+    
+    if scope == "all":
+        with st.expander("색인 관리"):
+            st.caption("처음 사용할 때, 시트를 직접 수정했을 때, 이벤트 모드에서 운영일지 특이사항이 시트와 다를 때 재구축하세요.")
+            if st.button("🔄 색인 재구축", key="sr_rb"):
+                st.success(f"{rebuild_search_index():,}건 색인 완료")
+
 def ui_stats():
     st.header("📊 통계")
     c1, c2 = st.columns(2)
@@ -746,14 +1466,14 @@ def ui_stats():
     
     if st.button("통계 불러오기"):
         # 1. 장소 통계 (운영일지)
-        df_op = load_data(SHEET_OPERATION, sy, sm, None)
+        df_op = load_data(SHEET_OPERATION, sy, sm, None, columns=['장소', '탐방객수'])
         total_v = 0
         if not df_op.empty:
             df_op['탐방객수'] = pd.to_numeric(df_op['탐방객수'], errors='coerce').fillna(0)
             total_v = int(df_op['탐방객수'].sum())
             
         # 2. 개인 통계 (활동일지)
-        df_act = load_data(SHEET_ACTIVITY, sy, sm, None)
+        df_act = load_data(SHEET_ACTIVITY, sy, sm, None, columns=['이름', '청취자수', '해설횟수'])
         total_l = 0; total_c = 0
         if not df_act.empty:
             df_act['청취자수'] = pd.to_numeric(df_act['청취자수'], errors='coerce').fillna(0)
@@ -780,14 +1500,14 @@ def ui_stats():
 # =========================================================
 def main():
     if not st.session_state['logged_in']:
+        if not is_lite(): apply_style()
         st.markdown("## 🔐 로그인")
         with st.form("login"):
             uid = st.text_input("아이디")
             upw = st.text_input("비밀번호", type="password")
             if st.form_submit_button("로그인"):
                 try:
-                    sh = client.open("지질공원_운영일지_DB").worksheet("사용자")
-                    users = sh.get_all_records()
+                    users = _fetch_records(SHEET_USERS)
                     found = next((u for u in users if str(u['아이디']) == uid and str(u['비번']) == upw), None)
                     if found:
                         st.session_state['logged_in'] = True
@@ -798,25 +1518,37 @@ def main():
     else:
         user = st.session_state['user_info']
         name = user['이름']; role = user['직책']; island = user['섬']
+        lite = role != "관리자" and is_lite(user)
+        if not lite: apply_style()
         
         with st.sidebar:
             st.info(f"{name} ({role})")
             if st.button("로그아웃"):
                 st.session_state['logged_in'] = False; st.rerun()
+            if role != "관리자" and st.button("🖥️ 전체 화면으로" if lite else "📱 라이트 모드로"):
+                st.session_state['lite_pref'] = not lite; st.rerun()
+            if EVENT_MODE and role == "관리자" and st.button("🗜️ 이벤트 압축"):
+                st.success(f"{compact_events()}건 반영")
                 
-        if role == "관리자":
-            t1, t2, t3, t4 = st.tabs(["🔍 활동조회", "🗓️ 계획조회", "📊 통계", "✅ 계획승인"])
+        if lite:
+            ui_journal_lite(name, island)
+        elif role == "관리자":
+            t1, t2, t3, t4, t5, t6 = st.tabs(["🔍 활동조회", "🗓️ 계획조회", "📊 통계", "✅ 계획승인", "🔁 반복계획", "🔎 검색"])
             with t1: ui_view_journal("all", name, island)
             with t2: ui_view_plan("all", name, island, role)
             with t3: ui_stats()
             with t4: ui_approve(island, role)
+            with t5: ui_plan_template(name, island, role)
+            with t6: ui_search("all", island)
         elif role == "조장":
-            t1, t2, t3, t4, t5 = st.tabs(["📝 일지작성", "🔍 활동조회", "🗓️ 계획조회", "✍️ 계획입력", "✅ 계획승인"])
+            t1, t2, t3, t4, t5, t6, t7 = st.tabs(["📝 일지작성", "🔍 활동조회", "🗓️ 계획조회", "✍️ 계획입력", "✅ 계획승인", "🔁 반복계획", "🔎 검색"])
             with t1: ui_journal_write(name, island)
             with t2: ui_view_journal("team", name, island)
             with t3: ui_view_plan("team", name, island, role)
             with t4: ui_plan_input(name, island)
             with t5: ui_approve(island, role)
+            with t6: ui_plan_template(name, island, role)
+            with t7: ui_search("team", island)
         else:
             t1, t2, t3, t4 = st.tabs(["📝 일지작성", "📅 내 활동", "🗓️ 내 계획", "✍️ 계획입력"])
             with t1: ui_journal_write(name, island)
@@ -825,4 +1557,5 @@ def main():
             with t4: ui_plan_input(name, island)
 
 if __name__ == "__main__":
-    main()
+    if "--compact" in sys.argv: print(f"compacted {compact_events()} events")
+    else: main()